@@ -1,19 +1,29 @@
 import io
+import errno
 import re
 import os
 import json
+import hashlib
+import functools
+import time
+import httpx
 import shutil
-import base64
+import tempfile
+import binascii
 import typer
+import asyncio
+import multiprocessing
 import concurrent.futures
+import diskcache
 
-from PIL import Image
+from PIL import Image, ImageFile
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.progress import Progress
 from collections import defaultdict
-from openai import OpenAI, APIError
-from typing import Optional
+from openai import AsyncOpenAI, APIError
+from enum import Enum
+from typing import Iterator, Optional, Union
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -29,7 +39,53 @@ DEFAULT_MIN_BIB_LEN = 3
 DEFAULT_MAX_BIB_LEN = 4
 DEFAULT_PROVIDER = "deepinfra/bf16"
 DEFAULT_MAX_SIZE_KB = 1500
+# First JPEG quality tried when re-encoding; lower qualities are only predicted from its size.
+PROBE_QUALITY = 85
+DEFAULT_REQUESTS_PER_MINUTE = 600
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_BATCH_SIZE = 1
+DEFAULT_LINK_MODE = "hardlink"
+DEFAULT_THUMB_MAX = 768
+# Qwen2.5-VL bills one token per 28x28 patch of the image.
+IMAGE_PATCH_SIZE = 28
+# Detection log lines are printed once this many are pending or this many seconds have passed.
+LOG_FLUSH_LINES = 20
+LOG_FLUSH_INTERVAL = 0.25
+SUPPORTED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
 CONFIG_FILE = "config.json"
+CACHE_DIR = ".rnr_cache"
+# Linux ioctl cloning a file's extents (Btrfs, XFS, ...), from <linux/fs.h>.
+FICLONE = 0x40049409
+
+# Request pieces shared by every completion call.
+EXTRA_HEADERS = {"HTTP-Referer": SITE_URL, "X-Title": SITE_NAME}
+EXTRA_BODY = {"provider": {"only": [DEFAULT_PROVIDER]}}
+PROMPT_TEMPLATE = (
+    "Identify all race bib numbers in this image. "
+    "Respond with only the numbers, separated by commas. "
+    "For example: 123,431,890. The bib numbers are always between {min_bib_len} and {max_bib_len} digits. If no numbers are found, respond with 'none'."
+)
+BATCH_PROMPT_TEMPLATE = (
+    "Identify all race bib numbers in each of the {num_images} images below. "
+    "Respond with one line per image, in order, formatted as 'index: numbers' with the numbers separated by commas, "
+    "or 'index: none' if no numbers are found. Indexes start at 1. "
+    "For example:\n1: 123,431\n2: none\n3: 890\n"
+    "The bib numbers are always between {min_bib_len} and {max_bib_len} digits."
+)
+
+# Matches the "index:" markers of a batched response; splitting a line on it yields (index, numbers) pairs.
+# An index must start the line or follow whitespace or a separator, so digits inside a bib never count.
+BATCH_INDEX_PATTERN = re.compile(r"(?:^|(?<=[\s,;]))(\d+)[ \t]*:")
+
+
+class LinkMode(str, Enum):
+    """How images are placed into the per-number directories."""
+
+    HARDLINK = "hardlink"
+    SYMLINK = "symlink"
+    COPY = "copy"
+    REFLINK = "reflink"
+
 
 app = typer.Typer()
 console = Console()
@@ -38,6 +94,25 @@ load_dotenv()
 
 API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; reflinks then fall back to regular copies.
+    fcntl = None
+
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+
+    # One libjpeg-turbo handle shared by all encodes in this process.
+    TURBO_JPEG = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    # PyTurboJPEG or the libturbojpeg shared library is unavailable; fall back to Pillow's encoder.
+    TURBO_JPEG = None
+
+# Race photos copied straight off memory cards are occasionally truncated; decode what is there.
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
 
 def load_config() -> dict:
     """
@@ -68,22 +143,44 @@ def save_config(config: dict):
     console.print(f"[bold green]Configuration saved to {CONFIG_FILE}[/bold green]")
 
 
-def scan_directory(directory: str) -> list[str]:
+def scan_directory(directory: str) -> Iterator[str]:
     """
     Scans the specified directory for image files with supported extensions.
 
     Args:
         directory (str): The path to the directory to scan.
 
+    Yields:
+        str: The path of each image file found in the directory.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # Only the tail can hold an extension, so only that much is lowercased.
+            if entry.name[-5:].lower().endswith(SUPPORTED_EXTENSIONS) and entry.is_file():
+                yield entry.path
+
+
+def encode_data_uri(data: Union[bytes, memoryview]) -> str:
+    """
+    Encodes raw JPEG bytes as a base64 data URI.
+
+    Args:
+        data (Union[bytes, memoryview]): The JPEG data to encode.
+
     Returns:
-        list[str]: A list of file paths for image files found in the directory.
+        str: A base64-encoded JPEG image URI.
+
+    Notes:
+        The data is encoded in chunks straight into a single buffer, so no full-size intermediate base64 `bytes`
+        object is ever held alongside the result.
     """
-    files = []
-    supported_extensions = {".jpg", ".jpeg", ".png", ".webp"}
-    for item in os.scandir(directory):
-        if item.is_file() and os.path.splitext(item.name)[1].lower() in supported_extensions:
-            files.append(item.path)
-    return files
+    # A multiple of 3 bytes so that no chunk but the last is padded.
+    chunk_size = 57 * 1024
+    view = memoryview(data)
+    out = bytearray(b"data:image/jpeg;base64,")
+    for i in range(0, len(view), chunk_size):
+        out += binascii.b2a_base64(view[i : i + chunk_size], newline=False)
+    return out.decode("ascii")
 
 
 def image_to_base64_uri(
@@ -100,17 +197,301 @@ def image_to_base64_uri(
         str: A base64-encoded JPEG image URI suitable for embedding in HTML.
 
     Notes:
-        The function reduces JPEG quality in steps of 5 until the encoded image fits within the specified size or the quality reaches 10.
+        The image is first encoded at PROBE_QUALITY, which most race photos fit at. If that is too large, the quality
+        is predicted from the overshoot and the image encoded once more, falling back to quality 10 if the prediction
+        still does not fit. Chroma is always subsampled 4:2:0.
+        RGB images are encoded with libjpeg-turbo via PyTurboJPEG when it is available, otherwise with Pillow.
+    """
+
+    if TURBO_JPEG is not None and image.mode == "RGB":
+        pixels = np.asarray(image)
+
+        def encode(quality: int) -> io.BytesIO:
+            buffered = io.BytesIO()
+            buffered.write(
+                TURBO_JPEG.encode(
+                    pixels, quality=quality, pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420
+                )
+            )
+            return buffered
+
+    else:
+
+        def encode(quality: int) -> io.BytesIO:
+            buffered = io.BytesIO()
+            image.save(buffered, format="JPEG", quality=quality, subsampling=2, optimize=False)
+            return buffered
+
+    max_size_bytes = max_size_kb * 1024
+    buffered = encode(PROBE_QUALITY)
+    if buffered.tell() > max_size_bytes:
+        # JPEG size grows faster than linearly with quality, hence the square root of the overshoot.
+        ratio = max_size_bytes / buffered.tell()
+        buffered.close()
+        buffered = encode(max(10, min(90, int(PROBE_QUALITY * ratio**0.5))))
+        if buffered.tell() > max_size_bytes:
+            buffered.close()
+            buffered = encode(10)
+    with buffered.getbuffer() as view:
+        uri = encode_data_uri(view)
+    buffered.close()
+    return uri
+
+
+class RateLimiter:
+    """
+    Proactive token-bucket limiter pacing requests against per-minute request and token budgets.
+
+    Capacity is refilled continuously on a monotonic clock; callers wait until enough request and
+    token capacity is available instead of firing and being rejected with HTTP 429.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.available_request_capacity = float(requests_per_minute)
+        self.available_token_capacity = float(tokens_per_minute)
+        self.last_update_time = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update_time
+        self.available_request_capacity = min(
+            self.available_request_capacity + self.requests_per_minute * elapsed / 60.0,
+            self.requests_per_minute,
+        )
+        self.available_token_capacity = min(
+            self.available_token_capacity + self.tokens_per_minute * elapsed / 60.0,
+            self.tokens_per_minute,
+        )
+        self.last_update_time = now
+
+    async def acquire(self, tokens: int):
+        """
+        Waits until one request and the given number of tokens can be spent, then consumes them.
+
+        Args:
+            tokens (int): Estimated number of tokens the request will consume.
+        """
+        # A single request larger than the whole budget would otherwise wait forever.
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= tokens
+                    return
+                wait_time = max(
+                    (1 - self.available_request_capacity) * 60.0 / self.requests_per_minute,
+                    (tokens - self.available_token_capacity) * 60.0 / self.tokens_per_minute,
+                )
+                await asyncio.sleep(wait_time)
+
+
+def estimate_tokens(
+    prompt_text: str, max_tokens: int, num_images: int = 1, thumb_max: int = DEFAULT_THUMB_MAX
+) -> int:
+    """
+    Roughly estimates the number of tokens a completion request will consume.
+
+    Args:
+        prompt_text (str): The text part of the prompt.
+        max_tokens (int): The completion token limit of the request.
+        num_images (int, optional): Number of images attached to the request. Defaults to 1.
+        thumb_max (int, optional): Longest edge of the attached images in pixels. Defaults to DEFAULT_THUMB_MAX.
+
+    Returns:
+        int: Estimated prompt, image and completion tokens.
+    """
+    image_tokens = (thumb_max // IMAGE_PATCH_SIZE) ** 2
+    return len(prompt_text) // 4 + image_tokens * num_images + max_tokens
+
+
+def encode_image(
+    file_path: str,
+    max_size_kb: int = DEFAULT_MAX_SIZE_KB,
+    thumb_max: int = DEFAULT_THUMB_MAX,
+) -> str:
+    """
+    Loads an image from disk, resizes it and encodes it as a base64 JPEG URI.
+
+    JPEG files that are already within the size limit and at most `thumb_max` pixels are passed through without re-encoding.
+
+    Args:
+        file_path (str): Path to the image file to encode.
+        max_size_kb (int, optional): The maximum allowed size of the encoded image in kilobytes. Defaults to DEFAULT_MAX_SIZE_KB.
+        thumb_max (int, optional): Longest edge of the encoded image in pixels. Defaults to DEFAULT_THUMB_MAX.
+
+    Returns:
+        str: A base64-encoded JPEG image URI.
+    """
+    file_size = os.path.getsize(file_path)
+    with Image.open(file_path) as image:
+        # Only the header has been read so far; JPEGs that already fit are sent as-is.
+        if (
+            image.format == "JPEG"
+            and image.mode in ("RGB", "L")
+            and file_size <= max_size_kb * 1024
+            and max(image.size) <= thumb_max
+        ):
+            with open(file_path, "rb") as f:
+                return encode_data_uri(f.read())
+        # The stored dimensions come from the header, so already small images skip draft and resize entirely.
+        need_resize = max(image.size) > thumb_max
+        if need_resize and image.format == "JPEG":
+            # Let libjpeg scale down in the DCT domain instead of decoding every pixel.
+            image.draft("RGB", (thumb_max, thumb_max))
+        image.load()
+        # Most JPEGs already decode to RGB; converting them would only copy the pixels.
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if need_resize:
+            # reducing_gap box-filters large reductions before the Lanczos pass.
+            image.thumbnail((thumb_max, thumb_max), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        return image_to_base64_uri(image, max_size_kb)
+
+
+def lookup_encoded_image(
+    file_path: str, max_size_kb: int, thumb_max: int, cache: diskcache.Cache
+) -> tuple[tuple, Optional[str]]:
+    """
+    Looks up a previously stored URI for an image, keyed so that it is invalidated when the file or the
+    encoding settings change.
+
+    Args:
+        file_path (str): Path to the image file.
+        max_size_kb (int): The maximum allowed size of the encoded image in kilobytes.
+        thumb_max (int): Longest edge of the encoded image in pixels.
+        cache (diskcache.Cache): Persistent cache to read from.
+
+    Returns:
+        tuple[tuple, Optional[str]]: The cache key, and the stored URI or None on a miss.
+    """
+    st = os.stat(file_path)
+    key = ("uri", os.path.abspath(file_path), st.st_mtime_ns, st.st_size, max_size_kb, thumb_max)
+    return key, cache.get(key)
+
+
+async def encode_images(
+    file_paths: list[str],
+    max_size_kb: int,
+    thumb_max: int,
+    cache: Optional[diskcache.Cache],
+    encode_pool: concurrent.futures.Executor,
+    encode_semaphore: asyncio.Semaphore,
+) -> list[tuple[str, Optional[str]]]:
+    """
+    Encodes the images of one request, reusing cached URIs for unchanged files.
+
+    Args:
+        file_paths (list[str]): Paths to the image files to encode.
+        max_size_kb (int): The maximum allowed size of the encoded images in kilobytes.
+        thumb_max (int): Longest edge of the encoded images in pixels.
+        cache (Optional[diskcache.Cache]): Persistent cache for encoded images, or None to always encode.
+        encode_pool (concurrent.futures.Executor): Process pool the CPU-bound image encoding runs in.
+        encode_semaphore (asyncio.Semaphore): Bounds encodes in flight to the size of `encode_pool`.
+
+    Returns:
+        list[tuple[str, Optional[str]]]: A (file path, URI) pair per image; the URI is None if the image could
+            not be encoded (e.g., a corrupted file), which is logged.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def encode(file_path: str) -> Optional[str]:
+        try:
+            key = None
+            if cache is not None:
+                # diskcache calls block on SQLite, so they run in a thread rather than on the event loop.
+                key, uri = await asyncio.to_thread(
+                    lookup_encoded_image, file_path, max_size_kb, thumb_max, cache
+                )
+                if uri is not None:
+                    return uri
+            # Decoding and encoding are CPU-bound and hold the GIL, so they run in worker processes.
+            async with encode_semaphore:
+                uri = await loop.run_in_executor(
+                    encode_pool, encode_image, file_path, max_size_kb, thumb_max
+                )
+            if cache is not None:
+                await asyncio.to_thread(cache.set, key, uri)
+            return uri
+        except Exception as e:
+            console.print(f"[bold red]Error processing {os.path.basename(file_path)}:[/bold red] {e}")
+            return None
+
+    uris = await asyncio.gather(*(encode(file_path) for file_path in file_paths))
+    return list(zip(file_paths, uris))
+
+
+@functools.lru_cache(maxsize=None)
+def build_prompt(num_images: int, min_bib_len: int, max_bib_len: int) -> str:
+    """
+    Builds the detection prompt for a request carrying one or more images.
+
+    Args:
+        num_images (int): Number of images attached to the request.
+        min_bib_len (int): Minimum length of bib numbers to detect.
+        max_bib_len (int): Maximum length of bib numbers to detect.
+
+    Returns:
+        str: The prompt text.
+    """
+    if num_images == 1:
+        return PROMPT_TEMPLATE.format(min_bib_len=min_bib_len, max_bib_len=max_bib_len)
+    return BATCH_PROMPT_TEMPLATE.format(
+        num_images=num_images, min_bib_len=min_bib_len, max_bib_len=max_bib_len
+    )
+
+
+def compile_bib_pattern(min_bib_len: int, max_bib_len: int) -> re.Pattern:
+    """
+    Compiles a pattern matching whole digit runs of a valid bib number length.
+
+    Args:
+        min_bib_len (int): Minimum length of bib numbers to detect.
+        max_bib_len (int): Maximum length of bib numbers to detect.
+
+    Returns:
+        re.Pattern: The compiled pattern.
+    """
+    return re.compile(rf"(?<!\d)\d{{{min_bib_len},{max_bib_len}}}(?!\d)")
+
+
+def parse_response(
+    response_text: str, file_paths: list[str], bib_pattern: re.Pattern
+) -> list[tuple[str, list[str]]]:
+    """
+    Maps a model response back to the images of the request it answers.
+
+    Args:
+        response_text (str): The lowercased model response.
+        file_paths (list[str]): Paths of the images, in the order they were sent.
+        bib_pattern (re.Pattern): Pattern matching valid bib numbers, see `compile_bib_pattern`.
+
+    Returns:
+        list[tuple[str, list[str]]]: A (file path, detected bib numbers) pair for every image in `file_paths`.
     """
-    quality = 95
-    while True:
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=quality)
-        if buffered.tell() / 1024 <= max_size_kb or quality <= 10:
-            break
-        quality -= 5
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return f"data:image/jpeg;base64,{img_str}"
+
+    def extract(text: str) -> list[str]:
+        if "none" in text or not text:
+            return []
+        return bib_pattern.findall(text)
+
+    if len(file_paths) == 1:
+        return [(file_paths[0], extract(response_text))]
+
+    results = [(file_path, []) for file_path in file_paths]
+    # Each answer runs to the end of its line or to the next index, so an empty answer never swallows the
+    # following line and "1: 123, 2: 456" is split between both images.
+    for line in response_text.splitlines():
+        parts = BATCH_INDEX_PATTERN.split(line)
+        for index, numbers in zip(parts[1::2], parts[2::2]):
+            position = int(index) - 1
+            if 0 <= position < len(file_paths):
+                results[position] = (file_paths[position], extract(numbers))
+    return results
 
 
 @retry(
@@ -118,70 +499,322 @@ def image_to_base64_uri(
     wait=wait_exponential(multiplier=1, min=2, max=30),
     retry=retry_if_exception_type(APIError),
 )
-def process_single_image(
-    file_path: str, client: OpenAI, min_bib_len: int, max_bib_len: int
-) -> tuple[str, list[str]]:
+async def process_batch(
+    encoded: list[tuple[str, str]],
+    client: AsyncOpenAI,
+    rate_limiter: RateLimiter,
+    cache: Optional[diskcache.Cache],
+    api_model: str,
+    min_bib_len: int,
+    max_bib_len: int,
+    bib_pattern: re.Pattern,
+    thumb_max: int,
+) -> list[tuple[str, list[str]]]:
     """
-    Processes a single image to identify race bib numbers using an AI model.
+    Processes a batch of encoded images in a single request to identify race bib numbers using an AI model.
 
     Args:
-        file_path (str): Path to the image file to be processed.
-        client (OpenAI): An OpenAI client instance for making API requests.
+        encoded (list[tuple[str, str]]): (file path, base64 image URI) pairs to be processed together.
+        client (AsyncOpenAI): An async OpenAI client instance for making API requests.
+        rate_limiter (RateLimiter): Limiter pacing requests against the API rate budget.
+        cache (Optional[diskcache.Cache]): Persistent cache for model responses, or None.
+        api_model (str): API model to use for detection.
         min_bib_len (int): Minimum length of bib numbers to detect.
         max_bib_len (int): Maximum length of bib numbers to detect.
+        bib_pattern (re.Pattern): Pattern matching valid bib numbers, see `compile_bib_pattern`.
+        thumb_max (int): Longest edge of the encoded images in pixels.
 
     Returns:
-        tuple[str, list[str]]: A tuple containing the file path and a list of detected bib numbers as strings.
-            If no bib numbers are found or an error occurs, the list will be empty.
+        list[tuple[str, list[str]]]: A (file path, detected bib numbers) pair for every image in the batch.
+            If no bib numbers are found or an error occurs, the list for that image will be empty.
 
     Raises:
         APIError: If an API error occurs during processing (retries up to 5 times).
-        Exception: For other errors (e.g., corrupted image files), logs the error and returns an empty list.
+        Exception: For other errors (e.g., malformed responses), logs the error and returns empty lists.
     """
+    file_paths = [file_path for file_path, _ in encoded]
+
     try:
-        with Image.open(file_path).convert("RGB") as image:
-            image.thumbnail((1024, 1024))
-            base64_image_uri = image_to_base64_uri(image)
-
-        prompt_text = (
-            f"Identify all race bib numbers in this image. "
-            f"Respond with only the numbers, separated by commas. "
-            f"For example: 123,431,890. The bib numbers are always between {min_bib_len} and {max_bib_len} digits. If no numbers are found, respond with 'none'."
-        )
+        prompt_text = build_prompt(len(encoded), min_bib_len, max_bib_len)
+        max_tokens = 30 * len(encoded)
 
-        extra_body_params = {"provider": {"only": [DEFAULT_PROVIDER]}}
-
-        completion = client.chat.completions.create(
-            extra_headers={"HTTP-Referer": SITE_URL, "X-Title": SITE_NAME},
-            model=DEFAULT_API_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt_text},
-                        {"type": "image_url", "image_url": {"url": base64_image_uri}},
-                    ],
-                }
-            ],
-            max_tokens=30,
-            extra_body=extra_body_params,
+        uri_digest = hashlib.sha256()
+        for _, uri in encoded:
+            uri_digest.update(uri.encode("ascii"))
+        response_key = (
+            "response",
+            uri_digest.hexdigest(),
+            api_model,
+            DEFAULT_PROVIDER,
+            hashlib.sha256(prompt_text.encode("utf-8")).hexdigest(),
+        )
+        # diskcache calls block on SQLite, so they run off the event loop like the image URI lookups.
+        response_text = (
+            await asyncio.to_thread(cache.get, response_key) if cache is not None else None
         )
 
-        response_text = completion.choices[0].message.content.strip().lower()
+        if response_text is None:
+            await rate_limiter.acquire(estimate_tokens(prompt_text, max_tokens, len(encoded), thumb_max))
+            completion = await client.chat.completions.create(
+                extra_headers=EXTRA_HEADERS,
+                model=api_model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [{"type": "text", "text": prompt_text}]
+                        + [
+                            {"type": "image_url", "image_url": {"url": uri}}
+                            for _, uri in encoded
+                        ],
+                    }
+                ],
+                max_tokens=max_tokens,
+                extra_body=EXTRA_BODY,
+            )
 
-        if "none" in response_text or not response_text:
-            return file_path, []
+            response_text = completion.choices[0].message.content.strip().lower()
+            if cache is not None:
+                await asyncio.to_thread(cache.set, response_key, response_text)
 
-        detected_numbers = re.findall(r"\d+", response_text)
-        filtered_numbers = [
-            num for num in detected_numbers if min_bib_len <= len(num) <= max_bib_len
-        ]
-        return file_path, filtered_numbers
+        return parse_response(response_text, file_paths, bib_pattern)
 
-    # Catch non-API errors (e.g., corrupted image files) that tenacity won't retry.
+    # Let API errors reach tenacity; it is the only layer retrying them.
+    except APIError:
+        raise
     except Exception as e:
-        console.print(f"[bold red]Error processing {os.path.basename(file_path)}:[/bold red] {e}")
-        return file_path, []
+        names = ", ".join(os.path.basename(file_path) for file_path in file_paths)
+        console.print(f"[bold red]Error processing {names}:[/bold red] {e}")
+        return [(file_path, []) for file_path in file_paths]
+
+
+async def detect_numbers(
+    files: list[str],
+    api_model: str,
+    workers: int,
+    min_bib_len: int,
+    max_bib_len: int,
+    max_size_kb: int,
+    thumb_max: int,
+    requests_per_minute: int,
+    tokens_per_minute: int,
+    cache: Optional[diskcache.Cache],
+    encode_pool: concurrent.futures.Executor,
+    encode_workers: int,
+    batch_size: int,
+) -> dict[str, set[str]]:
+    """
+    Runs detection over all files concurrently on a single event loop.
+
+    Each batch is first encoded in `encode_pool`, bounded by the number of encoding processes, and only then
+    takes one of the `workers` API slots, so encoding the next batches overlaps with requests in flight.
+
+    Args:
+        files (list[str]): Paths of the image files to process.
+        api_model (str): API model to use for detection.
+        workers (int): Maximum number of requests in flight at once.
+        min_bib_len (int): Minimum bib number length to detect.
+        max_bib_len (int): Maximum bib number length to detect.
+        max_size_kb (int): Maximum image size in KB for base64 encoding.
+        thumb_max (int): Longest edge of the encoded images in pixels.
+        requests_per_minute (int): Request budget per minute.
+        tokens_per_minute (int): Token budget per minute.
+        cache (Optional[diskcache.Cache]): Persistent cache for encoded images and model responses, or None.
+        encode_pool (concurrent.futures.Executor): Process pool the CPU-bound image encoding runs in.
+        encode_workers (int): Number of processes in `encode_pool`.
+        batch_size (int): Number of images sent per request.
+
+    Returns:
+        dict[str, set[str]]: Mapping of detected bib numbers to the image paths they were found in.
+    """
+    number_to_images = defaultdict(set)
+    semaphore = asyncio.Semaphore(workers)
+    encode_semaphore = asyncio.Semaphore(encode_workers)
+    # Bounds batches that are encoding, encoded and waiting, or in flight, so encoded URIs for the whole
+    # directory never pile up in memory ahead of the API.
+    pending = asyncio.Semaphore(workers + encode_workers)
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    bib_pattern = compile_bib_pattern(min_bib_len, max_bib_len)
+
+    # One keep-alive HTTP/2 pool for the whole run, so TLS handshakes are paid once per connection.
+    # No custom transport: httpx only honours HTTP(S)_PROXY / ALL_PROXY when it builds its own.
+    # SDK retries are disabled; tenacity is the single retry authority.
+    async with httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_keepalive_connections=workers, max_connections=workers * 2
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        follow_redirects=True,
+    ) as http_client:
+        client = AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=API_KEY,
+            http_client=http_client,
+            max_retries=0,
+        )
+
+        async def bound(batch: list[str]) -> list[tuple[str, list[str]]]:
+            async with pending:
+                images = await encode_images(
+                    batch, max_size_kb, thumb_max, cache, encode_pool, encode_semaphore
+                )
+                # A corrupted image only drops out of its batch; the others are still sent.
+                results = [(file_path, []) for file_path, uri in images if uri is None]
+                encoded = [(file_path, uri) for file_path, uri in images if uri is not None]
+                if not encoded:
+                    return results
+                async with semaphore:
+                    try:
+                        return results + await process_batch(
+                            encoded,
+                            client,
+                            rate_limiter,
+                            cache,
+                            api_model,
+                            min_bib_len,
+                            max_bib_len,
+                            bib_pattern,
+                            thumb_max,
+                        )
+                    except Exception as e:
+                        names = ", ".join(os.path.basename(file_path) for file_path, _ in encoded)
+                        console.print(
+                            f"[bold red]A task failed for {names} after all retries: {e}[/bold red]"
+                        )
+                        return results + [(file_path, []) for file_path, _ in encoded]
+
+        batches = [files[i : i + batch_size] for i in range(0, len(files), batch_size)]
+
+        # Completions are handed to a separate consumer, so draining `as_completed` never waits on grouping
+        # or terminal output.
+        queue = asyncio.Queue(maxsize=workers * 2)
+
+        async def producer():
+            for coro in asyncio.as_completed([bound(batch) for batch in batches]):
+                for result in await coro:
+                    await queue.put(result)
+            await queue.put(None)
+
+        async def consumer(progress: Progress, task):
+            # Detection lines are flushed in groups; printing each one redraws the live progress bar.
+            pending_messages = []
+            last_flush = time.monotonic()
+
+            def flush():
+                nonlocal last_flush
+                if pending_messages:
+                    progress.console.print("\n".join(pending_messages))
+                    pending_messages.clear()
+                last_flush = time.monotonic()
+
+            while True:
+                # Waking up every LOG_FLUSH_INTERVAL flushes pending lines even while completions stall
+                # (retry backoff, rate limiting, a slow batch).
+                try:
+                    item = await asyncio.wait_for(queue.get(), LOG_FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    flush()
+                    continue
+                if item is None:
+                    break
+                file_path, detected_numbers = item
+                if detected_numbers:
+                    for number in detected_numbers:
+                        number_to_images[number].add(file_path)
+                    pending_messages.append(
+                        f"File: [green]{os.path.basename(file_path)}[/green] -> Detected: [bold cyan]{', '.join(detected_numbers)}[/bold cyan]"
+                    )
+                progress.update(task, advance=1)
+                if (
+                    len(pending_messages) >= LOG_FLUSH_LINES
+                    or time.monotonic() - last_flush >= LOG_FLUSH_INTERVAL
+                ):
+                    flush()
+            flush()
+
+        with Progress(console=console) as progress:
+            task = progress.add_task("[cyan]Processing...", total=len(files))
+            await asyncio.gather(producer(), consumer(progress, task))
+
+    return number_to_images
+
+
+def fast_copy(src: str, dst: str, reflink: bool = False):
+    """
+    Copies a file's contents, letting the kernel move the data where possible.
+
+    Args:
+        src (str): Path of the file to copy.
+        dst (str): Path of the file to create or replace.
+        reflink (bool, optional): Try a copy-on-write clone (Linux FICLONE) first. Defaults to False.
+
+    Notes:
+        Uses os.copy_file_range (Linux), which copies without passing the data through user space and lets
+        filesystems that support it share extents. Falls back to a regular buffered copy where it is unavailable
+        or unsupported, e.g. across some filesystem boundaries. Permission bits are copied as well.
+
+        The copy is written to a temporary file next to `dst` and renamed into place. An existing `dst` that is a
+        hardlink or symlink to `src` (e.g. from an earlier run in another link mode) is therefore replaced
+        instead of written through, which would truncate `src`.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=os.path.dirname(dst) or None)
+    try:
+        with open(src, "rb") as s, os.fdopen(fd, "wb") as d:
+            try:
+                if reflink:
+                    fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                else:
+                    remaining = os.fstat(s.fileno()).st_size
+                    while remaining > 0:
+                        copied = os.copy_file_range(s.fileno(), d.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+            except (AttributeError, OSError):
+                s.seek(0)
+                d.seek(0)
+                d.truncate()
+                shutil.copyfileobj(s, d)
+        # Match shutil.copy, which the organize phase used before: copy the permission bits as well.
+        shutil.copymode(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def link_file(src: str, dst: str, link_mode: LinkMode):
+    """
+    Places `src` at `dst` using the given link mode.
+
+    Args:
+        src (str): Path of the source image.
+        dst (str): Path to create.
+        link_mode (LinkMode): Hardlink, symlink, copy, or reflink (copy-on-write clone).
+
+    Notes:
+        Hardlinks fall back to a copy across filesystem boundaries or on filesystems without link support,
+        and reflinks fall back to a copy where cloning is unsupported. An existing hardlink or symlink at
+        `dst` is left in place; copies and reflinks replace whatever is at `dst` without touching `src`.
+    """
+    if link_mode == LinkMode.HARDLINK:
+        try:
+            os.link(src, dst)
+        except OSError as e:
+            if e.errno in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+                fast_copy(src, dst)
+            elif e.errno != errno.EEXIST:
+                raise
+    elif link_mode == LinkMode.SYMLINK:
+        try:
+            os.symlink(os.path.abspath(src), dst)
+        except FileExistsError:
+            pass
+    else:
+        fast_copy(src, dst, reflink=link_mode == LinkMode.REFLINK)
 
 
 @app.command()
@@ -202,6 +835,24 @@ def process(
     max_size_kb: Optional[int] = typer.Option(
         None, help="Max image size in KB for base64 encoding (overrides config)."
     ),
+    thumb_max: Optional[int] = typer.Option(
+        None, min=IMAGE_PATCH_SIZE, help="Longest image edge in pixels sent to the model (overrides config)."
+    ),
+    requests_per_minute: Optional[int] = typer.Option(
+        None, min=1, help="API request budget per minute (overrides config)."
+    ),
+    tokens_per_minute: Optional[int] = typer.Option(
+        None, min=1, help="API token budget per minute (overrides config)."
+    ),
+    batch_size: Optional[int] = typer.Option(
+        None, min=1, help="Number of images sent per API request (overrides config)."
+    ),
+    link_mode: Optional[LinkMode] = typer.Option(
+        None, help="How images are placed into number folders (overrides config)."
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Re-encode all images and re-query the API, ignoring the cache."
+    ),
 ):
     """
     Processes a directory of images to detect race numbers and organizes them into subdirectories by detected number.
@@ -209,16 +860,22 @@ def process(
     Args:
         directory (str): Directory containing images to process.
         api_model (Optional[str], optional): API model to use for detection (overrides config).
-        workers (Optional[int], optional): Number of worker threads for parallel processing (overrides config).
+        workers (Optional[int], optional): Number of concurrent API requests (overrides config).
         min_bib_len (Optional[int], optional): Minimum bib number length to detect (overrides config).
         max_bib_len (Optional[int], optional): Maximum bib number length to detect (overrides config).
         max_size_kb (Optional[int], optional): Maximum image size in KB for base64 encoding (overrides config).
+        thumb_max (Optional[int], optional): Longest image edge in pixels sent to the model (overrides config).
+        requests_per_minute (Optional[int], optional): API request budget per minute (overrides config).
+        tokens_per_minute (Optional[int], optional): API token budget per minute (overrides config).
+        batch_size (Optional[int], optional): Number of images sent per API request (overrides config).
+        link_mode (Optional[LinkMode], optional): How images are placed into number folders (overrides config).
+        no_cache (bool, optional): Bypass the encoded image and response cache in CACHE_DIR.
 
     Workflow:
         - Loads configuration and applies overrides from CLI arguments.
         - Scans the specified directory for image files.
-        - Initializes the OpenAI API client.
-        - Processes images in parallel, detecting race numbers in each image.
+        - Initializes the async OpenAI API client.
+        - Processes images concurrently on a single event loop, detecting race numbers in each image.
         - Organizes images into subdirectories named after detected race numbers.
         - Provides progress updates and error reporting.
 
@@ -238,8 +895,18 @@ def process(
     effective_max_size_kb = max_size_kb or config.get(
         "max_size_kb", DEFAULT_MAX_SIZE_KB
     )
+    effective_thumb_max = thumb_max or config.get("thumb_max", DEFAULT_THUMB_MAX)
+    effective_requests_per_minute = requests_per_minute or config.get(
+        "requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE
+    )
+    effective_tokens_per_minute = tokens_per_minute or config.get(
+        "tokens_per_minute", DEFAULT_TOKENS_PER_MINUTE
+    )
+    effective_batch_size = batch_size or config.get("batch_size", DEFAULT_BATCH_SIZE)
+    effective_link_mode = LinkMode(link_mode or config.get("link_mode", DEFAULT_LINK_MODE))
 
-    files = scan_directory(directory)
+    # Materialised once: the progress bar and batching need the total up front.
+    files = list(scan_directory(directory))
     if not files:
         console.print(f"[bold red]No image files found in {directory}.[/bold red]")
         return
@@ -249,61 +916,84 @@ def process(
     )
     console.print(f"Using model: [bold cyan]{effective_api_model}[/bold cyan]")
 
+    cache = None if no_cache else diskcache.Cache(CACHE_DIR)
+    # One encoding process per usable core, but no more than the API stage can absorb (workers x batch_size
+    # images in flight): each spawned worker re-imports this module and its dependencies.
+    # Windows caps process pools at 61. API calls stay on the event loop.
+    # Workers are spawned rather than forked: they start lazily from a thread while the event loop is running.
+    if hasattr(os, "sched_getaffinity"):
+        # Respects CPU affinity masks, e.g. in containers.
+        available_cpus = len(os.sched_getaffinity(0))
+    else:
+        available_cpus = os.cpu_count() or 1
+    encode_workers = max(1, min(available_cpus, 61, effective_workers * effective_batch_size))
+    encode_pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=encode_workers, mp_context=multiprocessing.get_context("spawn")
+    )
     try:
-        client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=API_KEY)
+        number_to_images = asyncio.run(
+            detect_numbers(
+                files,
+                effective_api_model,
+                effective_workers,
+                effective_min_bib_len,
+                effective_max_bib_len,
+                effective_max_size_kb,
+                effective_thumb_max,
+                effective_requests_per_minute,
+                effective_tokens_per_minute,
+                cache,
+                encode_pool,
+                encode_workers,
+                effective_batch_size,
+            )
+        )
     except Exception as e:
-        console.print(f"[bold red]Failed to initialize API client: {e}[/bold red]")
+        console.print(f"[bold red]Failed to process images: {e}[/bold red]")
         return
-
-    number_to_images = defaultdict(list)
-
-    with Progress(console=console) as progress:
-        task = progress.add_task("[cyan]Processing...", total=len(files))
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=effective_workers
-        ) as executor:
-            future_to_file = {
-                executor.submit(
-                    process_single_image,
-                    file_path,
-                    client,
-                    effective_min_bib_len,
-                    effective_max_bib_len,
-                ): file_path
-                for file_path in files
-            }
-
-            for future in concurrent.futures.as_completed(future_to_file):
-                try:
-                    file_path, detected_numbers = future.result()
-                    if detected_numbers:
-                        for number in detected_numbers:
-                            number_to_images[number].append(file_path)
-                        progress.console.print(
-                            f"File: [green]{os.path.basename(file_path)}[/green] -> Detected: [bold cyan]{', '.join(detected_numbers)}[/bold cyan]"
-                        )
-                except Exception as e:
-                    file_path = future_to_file[future]
-                    console.print(
-                        f"[bold red]A task failed for {os.path.basename(file_path)} after all retries: {e}[/bold red]"
-                    )
-
-                progress.update(task, advance=1)
+    finally:
+        encode_pool.shutdown()
+        if cache is not None:
+            cache.close()
 
     console.print("\n--- Organizing files ---")
     if not number_to_images:
         console.print("[yellow]No valid numbers were detected to organize.[/yellow]")
         return
 
-    for number, images in number_to_images.items():
-        number_dir = os.path.join(directory, number)
+    # Create every target directory up front, and resolve each source name once even if it has several bibs.
+    number_dirs = {number: os.path.join(directory, number) for number in number_to_images}
+    for number_dir in number_dirs.values():
         os.makedirs(number_dir, exist_ok=True)
-        for img_path in set(images):
-            try:
-                shutil.copy(img_path, number_dir)
-            except Exception as e:
-                console.print(f"[bold red]Error copying {img_path} to {number_dir}: {e}[/bold red]")
-        console.print(f"Organized {len(set(images))} image(s) for number [bold magenta]{number}[/bold magenta] into [bold green]'{number_dir}'[/bold green]")
+    basenames = {
+        img_path: os.path.basename(img_path)
+        for images in number_to_images.values()
+        for img_path in images
+    }
+
+    # Links and copies are syscall-bound, so overlap them across a small thread pool.
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        number_to_futures = {
+            number: {
+                executor.submit(
+                    link_file,
+                    img_path,
+                    os.path.join(number_dirs[number], basenames[img_path]),
+                    effective_link_mode,
+                ): img_path
+                for img_path in images
+            }
+            for number, images in number_to_images.items()
+        }
+
+        for number, future_to_image in number_to_futures.items():
+            number_dir = number_dirs[number]
+            for future in concurrent.futures.as_completed(future_to_image):
+                try:
+                    future.result()
+                except Exception as e:
+                    console.print(f"[bold red]Error placing {future_to_image[future]} in {number_dir}: {e}[/bold red]")
+            console.print(f"Organized {len(future_to_image)} image(s) for number [bold magenta]{number}[/bold magenta] into [bold green]'{number_dir}'[/bold green]")
 
 
 @app.command()
@@ -317,6 +1007,21 @@ def set_config(
         None, help="Set maximum bib number length."
     ),
     max_size_kb: Optional[int] = typer.Option(None, help="Set max image size in KB."),
+    thumb_max: Optional[int] = typer.Option(
+        None, min=IMAGE_PATCH_SIZE, help="Set longest image edge in pixels sent to the model."
+    ),
+    requests_per_minute: Optional[int] = typer.Option(
+        None, min=1, help="Set API request budget per minute."
+    ),
+    tokens_per_minute: Optional[int] = typer.Option(
+        None, min=1, help="Set API token budget per minute."
+    ),
+    batch_size: Optional[int] = typer.Option(
+        None, min=1, help="Set number of images sent per API request."
+    ),
+    link_mode: Optional[LinkMode] = typer.Option(
+        None, help="Set how images are placed into number folders."
+    ),
 ):
     """
     Sets configuration values for the application and saves them to config.json.
@@ -327,6 +1032,11 @@ def set_config(
         min_bib_len (Optional[int]): The minimum length of a bib number.
         max_bib_len (Optional[int]): The maximum length of a bib number.
         max_size_kb (Optional[int]): The maximum image size in kilobytes.
+        thumb_max (Optional[int]): The longest image edge in pixels sent to the model.
+        requests_per_minute (Optional[int]): The API request budget per minute.
+        tokens_per_minute (Optional[int]): The API token budget per minute.
+        batch_size (Optional[int]): The number of images sent per API request.
+        link_mode (Optional[LinkMode]): How images are placed into number folders.
 
     If any option is provided, updates the corresponding value in the configuration file.
     If no options are provided, displays a message indicating that no changes were made.
@@ -349,6 +1059,21 @@ def set_config(
     if max_size_kb is not None:
         config["max_size_kb"] = max_size_kb
         updated = True
+    if thumb_max is not None:
+        config["thumb_max"] = thumb_max
+        updated = True
+    if requests_per_minute is not None:
+        config["requests_per_minute"] = requests_per_minute
+        updated = True
+    if tokens_per_minute is not None:
+        config["tokens_per_minute"] = tokens_per_minute
+        updated = True
+    if batch_size is not None:
+        config["batch_size"] = batch_size
+        updated = True
+    if link_mode is not None:
+        config["link_mode"] = link_mode.value
+        updated = True
 
     if updated:
         save_config(config)